@@ -1,27 +1,72 @@
 #!/usr/bin/env python3
 
+# Modules only some code paths need (json, tomllib, platform, shutil, ...)
+# are imported where they are used, so --help and early errors stay cheap.
+
 import argparse
-import json
+import functools
 import os
-import platform
-import shutil
+import stat
 import subprocess
 import sys
-import tomllib
+import time
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+# Only the cargo metadata fields we actually read. msgspec decodes straight
+# into these; without it, json.loads output is narrowed down to them.
+if msgspec is not None:
+
+    class Target(msgspec.Struct):
+        name: str
+        kind: List[str]
+
+    class Package(msgspec.Struct):
+        name: str
+        manifest_path: str
+        targets: List[Target]
+
+    class Meta(msgspec.Struct):
+        packages: List[Package]
+
+else:
+
+    class Target(NamedTuple):
+        name: str
+        kind: List[str]
+
+    class Package(NamedTuple):
+        name: str
+        manifest_path: str
+        targets: List[Target]
+
+    class Meta(NamedTuple):
+        packages: List[Package]
+
+
+VERBOSE = False
 
 
 def run(
-    cmd: List[str], *, check=True, env=None, capture=False, cwd=None
+    cmd: List[str], *, check=True, env=None, capture=False, cwd=None, binary=False
 ) -> subprocess.CompletedProcess:
-    print("> " + " ".join(cmd))
+    if VERBOSE:
+        print("> " + " ".join(cmd), flush=True)
     return subprocess.run(
-        cmd, check=check, env=env, cwd=cwd, text=True, capture_output=capture
+        cmd, check=check, env=env, cwd=cwd, text=not binary, capture_output=capture
     )
 
 
+@functools.lru_cache(maxsize=None)
 def have(cmd: str) -> bool:
+    import shutil
+
     return shutil.which(cmd) is not None
 
 
@@ -29,7 +74,46 @@ def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
 
 
+def _stat(p: Union[str, Path]) -> Optional[os.stat_result]:
+    try:
+        return os.stat(p)
+    except FileNotFoundError:
+        return None
+
+
+def copy_artifact(src: str, dest: str, src_st: Optional[os.stat_result] = None):
+    import shutil
+
+    src_st = src_st or os.stat(src)
+    dest_st = _stat(dest)
+    if (
+        dest_st is not None
+        and dest_st.st_size == src_st.st_size
+        and dest_st.st_mtime_ns == src_st.st_mtime_ns
+    ):
+        return
+
+    if sys.platform == "win32" and src_st.st_size > 0:
+        # No sendfile here; writing a mapped view moves the bytes through
+        # user space once instead of copy2's read buffer round trip.
+        import mmap
+
+        with open(src, "rb") as fsrc, mmap.mmap(
+            fsrc.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm, open(dest, "wb") as fdst:
+            fdst.write(mm)
+        shutil.copymode(src, dest)
+        os.utime(dest, ns=(src_st.st_atime_ns, src_st.st_mtime_ns))
+        return
+
+    # copyfile already uses sendfile on Linux, with a fallback when the
+    # filesystem doesn't support it.
+    shutil.copy2(src, dest)
+
+
 def host_os() -> str:
+    import platform
+
     s = platform.system().lower()
     if "windows" in s:
         return "windows"
@@ -46,8 +130,17 @@ def target_triple(os_: str, arch: int, windows_gnu: bool = False) -> str:
     return "i686-unknown-linux-gnu" if arch == 32 else "x86_64-unknown-linux-gnu"
 
 
-def load_toml(path: Path) -> Dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
+@functools.lru_cache(maxsize=None)
+def _load_toml_cached(path: str, mtime_ns: int) -> Dict[str, Any]:
+    import tomllib
+
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def load_toml(path: Path, st: Optional[os.stat_result] = None) -> Dict[str, Any]:
+    st = st or os.stat(path)
+    return _load_toml_cached(str(path.resolve()), st.st_mtime_ns)
 
 
 def normalize_crate_name(name: str) -> str:
@@ -70,24 +163,103 @@ def infer_lib_name_from_manifest(manifest: Dict[str, Any]) -> Optional[str]:
     return None
 
 
-def cargo_metadata(cwd: Path) -> Dict[str, Any]:
+def mtime_ns(p: Path) -> int:
+    st = _stat(p)
+    return st.st_mtime_ns if st is not None else 0
+
+
+def _metadata_cache(cwd: Path) -> Path:
+    import hashlib
+
+    # One file per workspace; the mtimes it was taken at are stored inside,
+    # so edits overwrite it instead of piling up new files.
+    digest = hashlib.sha1(str(cwd.resolve()).encode("utf-8")).hexdigest()[:16]
+    # Not under <cwd>/target: members build into their own target dir, so
+    # that would create an otherwise unused one at the workspace root.
+    return cache_home() / f"metadata-{digest}.json"
+
+
+def _metadata_cache_header(cwd: Path) -> bytes:
+    return f"{mtime_ns(cwd / 'Cargo.toml')} {mtime_ns(cwd / 'Cargo.lock')}\n".encode()
+
+
+def _metadata_cache_fresh(cache: Path, metadata: Meta) -> bool:
+    # The header only covers the root manifest; member manifests must still
+    # exist and not be newer than the cache.
+    cache_mtime = mtime_ns(cache)
+    for pkg in metadata.packages:
+        st = _stat(pkg.manifest_path)
+        if st is None or st.st_mtime_ns > cache_mtime:
+            return False
+    return True
+
+
+# What reading back a truncated or foreign cache file can raise.
+METADATA_CACHE_ERRORS: Tuple[type, ...] = (OSError, ValueError, KeyError, TypeError)
+if msgspec is not None:
+    METADATA_CACHE_ERRORS += (msgspec.DecodeError,)
+
+
+def decode_metadata(raw: bytes) -> Meta:
+    if msgspec is not None:
+        return msgspec.json.decode(raw, type=Meta)
+    import json
+
+    data = json.loads(raw)
+    return Meta(
+        packages=[
+            Package(
+                name=pkg["name"],
+                manifest_path=pkg["manifest_path"],
+                targets=[
+                    Target(name=tgt["name"], kind=tgt["kind"])
+                    for tgt in pkg.get("targets", [])
+                ],
+            )
+            for pkg in data.get("packages", [])
+        ]
+    )
+
+
+def cargo_metadata(cwd: Path) -> Meta:
+    cache = _metadata_cache(cwd)
+    header = _metadata_cache_header(cwd)
+    try:
+        cached_header, _, raw = cache.read_bytes().partition(b"\n")
+        if cached_header + b"\n" == header:
+            metadata = decode_metadata(raw)
+            if _metadata_cache_fresh(cache, metadata):
+                return metadata
+    except METADATA_CACHE_ERRORS:
+        pass
+
     if not have("cargo"):
         raise RuntimeError("cargo not found in PATH.")
     res = run(
         ["cargo", "metadata", "--no-deps", "--format-version", "1"],
         capture=True,
+        binary=True,
         cwd=str(cwd),
     )
-    return json.loads(res.stdout)
+    metadata = decode_metadata(res.stdout)
+
+    try:
+        ensure_dir(cache.parent)
+        tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(header + res.stdout)
+        os.replace(tmp, cache)
+    except OSError:
+        pass
+    return metadata
 
 
-def pick_workspace_cdylib(metadata: Dict[str, Any], cwd: Path) -> Tuple[Path, str]:
+def pick_workspace_cdylib(metadata: Meta, cwd: Path) -> Tuple[Path, str]:
     candidates: List[Tuple[Path, str]] = []
-    for pkg in metadata.get("packages", []):
-        for tgt in pkg.get("targets", []):
-            if "cdylib" in tgt.get("kind", []):
-                lib = normalize_crate_name(tgt.get("name") or pkg.get("name"))
-                pkg_dir = Path(pkg["manifest_path"]).parent.resolve()
+    for pkg in metadata.packages:
+        for tgt in pkg.targets:
+            if "cdylib" in tgt.kind:
+                lib = normalize_crate_name(tgt.name or pkg.name)
+                pkg_dir = Path(pkg.manifest_path).parent.resolve()
                 candidates.append((pkg_dir, lib))
                 break
     if not candidates:
@@ -109,11 +281,43 @@ def pick_workspace_cdylib(metadata: Dict[str, Any], cwd: Path) -> Tuple[Path, st
     raise RuntimeError(msg)
 
 
+def pick_member_cdylib(
+    manifest: Dict[str, Any], cwd: Path
+) -> Optional[Tuple[Path, str]]:
+    # Literal member paths can be read directly; globs, unreadable manifests
+    # and anything but exactly one cdylib are left to cargo metadata.
+    members = manifest["workspace"].get("members")
+    if not isinstance(members, list) or not members:
+        return None
+    if any(not isinstance(m, str) or any(c in m for c in "*?[") for m in members):
+        return None
+
+    candidates: List[Tuple[Path, str]] = []
+    for m in members:
+        member_dir = cwd / m
+        try:
+            member = load_toml(member_dir / "Cargo.toml")
+        except (OSError, ValueError):
+            return None
+        lib = member.get("lib")
+        crate_types = lib.get("crate-type", []) if isinstance(lib, dict) else []
+        if "cdylib" in crate_types:
+            name = infer_lib_name_from_manifest(member)
+            if not name:
+                return None
+            candidates.append((member_dir.resolve(), name))
+
+    if len(candidates) != 1:
+        return None
+    return candidates[0]
+
+
 def infer_pkg_and_lib(cwd: Path) -> Tuple[Path, str]:
     manifest_path = cwd / "Cargo.toml"
-    if not manifest_path.is_file():
+    st = _stat(manifest_path)
+    if st is None or not stat.S_ISREG(st.st_mode):
         raise RuntimeError(f"Cargo.toml not found in {cwd}")
-    manifest = load_toml(manifest_path)
+    manifest = load_toml(manifest_path, st)
     if not is_workspace_root(manifest):
         lib = infer_lib_name_from_manifest(manifest)
         if not lib:
@@ -121,6 +325,9 @@ def infer_pkg_and_lib(cwd: Path) -> Tuple[Path, str]:
                 "Could not infer lib name. Ensure [lib].name or [package].name is set."
             )
         return cwd, lib
+    picked = pick_member_cdylib(manifest, cwd)
+    if picked is not None:
+        return picked
     meta = cargo_metadata(cwd)
     return pick_workspace_cdylib(meta, cwd)
 
@@ -132,13 +339,14 @@ def artifact_path_for(
     os_: str,
     profile: str,
     windows_gnu: bool = False,
-) -> Path:
-    base = target_dir / target / profile
+) -> str:
     if os_ == "windows" or windows_gnu:
-        return base / f"{lib_name}.dll"
-    return base / (
-        f"{lib_name}.so" if lib_name.startswith("lib") else f"lib{lib_name}.so"
-    )
+        file_name = f"{lib_name}.dll"
+    else:
+        file_name = (
+            f"{lib_name}.so" if lib_name.startswith("lib") else f"lib{lib_name}.so"
+        )
+    return os.path.join(target_dir, target, profile, file_name)
 
 
 def gmod_suffix(os_: str, arch: int, windows_gnu: bool = False) -> str:
@@ -149,15 +357,407 @@ def gmod_suffix(os_: str, arch: int, windows_gnu: bool = False) -> str:
 
 
 def final_out_name(
-    outdir: Path, base_name: str, os_: str, arch: int, windows_gnu: bool = False
-) -> Path:
-    return outdir / (base_name + gmod_suffix(os_, arch, windows_gnu))
+    outdir: str, base_name: str, os_: str, arch: int, windows_gnu: bool = False
+) -> str:
+    return os.path.join(outdir, base_name + gmod_suffix(os_, arch, windows_gnu))
+
+
+def cache_home() -> Path:
+    return Path.home() / ".cache" / "gmodx-rs"
+
+
+def toolchain_cache_name(toolchain: str) -> str:
+    return toolchain.replace(os.sep, "_").replace("/", "_")
+
+
+def cargo_bin_memo(toolchain: str) -> Path:
+    return cache_home() / f"cargo-{toolchain_cache_name(toolchain)}.path"
+
+
+def cached_cargo_bin(toolchain: str) -> Optional[Path]:
+    try:
+        cached = Path(cargo_bin_memo(toolchain).read_text(encoding="utf-8").strip())
+    except OSError:
+        return None
+    st = _stat(cached)
+    return cached if st is not None and stat.S_ISREG(st.st_mode) else None
 
 
 def ensure_rust_toolchain_and_target(toolchain: str, target: str):
+    # Check the toolchain's own sysroot rather than a marker file, so a
+    # removed target or reinstalled toolchain is noticed.
+    cargo_bin = cached_cargo_bin(toolchain)
+    if cargo_bin is not None:
+        rustlib = cargo_bin.parent.parent / "lib" / "rustlib" / target / "lib"
+        st = _stat(rustlib)
+        if st is not None and stat.S_ISDIR(st.st_mode):
+            return
+
     if not have("rustup"):
         raise RuntimeError("rustup not found. Install Rust (rustup) first.")
-    run(["rustup", "target", "add", "--toolchain", toolchain, target])
+    res = run(
+        ["rustup", "target", "list", "--installed", "--toolchain", toolchain],
+        capture=True,
+        check=False,
+    )
+    if res.returncode != 0 or target not in res.stdout.split():
+        run(["rustup", "target", "add", "--toolchain", toolchain, target])
+
+
+def resolve_cargo_bin(toolchain: str) -> Path:
+    cached = cached_cargo_bin(toolchain)
+    if cached is not None:
+        return cached
+
+    memo = cargo_bin_memo(toolchain)
+    res = run(["rustup", "which", "--toolchain", toolchain, "cargo"], capture=True)
+    cargo_bin = Path(res.stdout.strip())
+    try:
+        ensure_dir(memo.parent)
+        memo.write_text(str(cargo_bin), encoding="utf-8")
+    except OSError:
+        pass
+    return cargo_bin
+
+
+def find_lockfile(pkg_dir: Path) -> Optional[Path]:
+    # Workspace members share the lock file at the workspace root; a lock
+    # further up belongs to something else.
+    for d in dict.fromkeys((pkg_dir, find_workspace_root(pkg_dir))):
+        lock = d / "Cargo.lock"
+        st = _stat(lock)
+        if st is not None and stat.S_ISREG(st.st_mode):
+            return lock
+    return None
+
+
+def registry_cache_populated() -> bool:
+    cargo_home = os.environ.get("CARGO_HOME")
+    cache = (Path(cargo_home) if cargo_home else Path.home() / ".cargo") / "registry"
+    try:
+        # One dir per registry index, each holding the downloaded .crate files.
+        with os.scandir(cache / "cache") as it:
+            for entry in it:
+                if entry.is_dir():
+                    with os.scandir(entry.path) as crates:
+                        if any(crates):
+                            return True
+    except OSError:
+        pass
+    return False
+
+
+def split_flags(s: str) -> List[str]:
+    import shlex
+
+    # Quotes group tokens, but backslashes are literal so Windows paths
+    # like /LIBPATH:C:\libs survive.
+    lex = shlex.shlex(s, posix=True)
+    lex.whitespace_split = True
+    lex.escape = ""
+    return list(lex)
+
+
+def find_workspace_root(pkg_dir: Path) -> Path:
+    # Same rule cargo uses: the nearest manifest (pkg_dir's own included)
+    # with a [workspace] table. Standalone packages are their own root.
+    for d in (pkg_dir, *pkg_dir.parents):
+        manifest_path = d / "Cargo.toml"
+        st = _stat(manifest_path)
+        if st is None or not stat.S_ISREG(st.st_mode):
+            continue
+        try:
+            if "workspace" in load_toml(manifest_path, st):
+                return d
+        except (OSError, ValueError):
+            continue
+    return pkg_dir
+
+
+VCS_DIRS = {".git", ".hg", ".svn", ".jj"}
+
+DEPENDENCY_TABLES = ("dependencies", "dev-dependencies", "build-dependencies")
+
+# Env vars that change what cargo, rustc or a build script produces. Anything
+# else a build script reads (rerun-if-env-changed) is not tracked; use -f.
+STAMP_ENV_PREFIXES = ("CARGO_", "RUST", "BINDGEN_", "LIBCLANG_")
+STAMP_ENV_NAMES = {"CC", "CXX", "AR", "CFLAGS", "CXXFLAGS", "LDFLAGS"}
+# CARGO_* vars that only affect how cargo runs, not its output.
+STAMP_ENV_IGNORED = {"CARGO_BUILD_JOBS", "CARGO_NET_OFFLINE", "CARGO_TERM_COLOR"}
+
+
+def build_stamp(toolchain: str, cargo_cmd: List[str], env: Dict[str, str]) -> str:
+    tracked = sorted(
+        f"{k}={v}"
+        for k, v in env.items()
+        if (k.startswith(STAMP_ENV_PREFIXES) or k in STAMP_ENV_NAMES)
+        and k not in STAMP_ENV_IGNORED
+    )
+    return "\n".join([toolchain, " ".join(cargo_cmd), *tracked])
+
+
+def _manifest_path_deps(manifest: Dict[str, Any]) -> List[str]:
+    tables: List[Any] = [manifest.get(t) for t in DEPENDENCY_TABLES]
+    for cfg in (manifest.get("target") or {}).values():
+        if isinstance(cfg, dict):
+            tables.extend(cfg.get(t) for t in DEPENDENCY_TABLES)
+    workspace = manifest.get("workspace")
+    if isinstance(workspace, dict):
+        tables.append(workspace.get("dependencies"))
+    tables.extend((manifest.get("patch") or {}).values())
+    return [
+        dep["path"]
+        for table in tables
+        if isinstance(table, dict)
+        for dep in table.values()
+        if isinstance(dep, dict) and isinstance(dep.get("path"), str)
+    ]
+
+
+def path_dependency_dirs(starts: List[Path]) -> List[Path]:
+    # Follows path = "..." dependencies transitively. A manifest that can't
+    # be read raises, which the caller treats as "not up to date".
+    seen: Dict[Path, None] = {}
+    queue = [d.resolve() for d in starts]
+    while queue:
+        d = queue.pop()
+        if d in seen:
+            continue
+        seen[d] = None
+        for rel in _manifest_path_deps(load_toml(d / "Cargo.toml")):
+            queue.append((d / rel).resolve())
+    return list(seen)
+
+
+def scan_roots(workspace_root: Path, dep_dirs: List[Path]) -> List[Path]:
+    roots: List[Path] = []
+    for d in sorted({workspace_root.resolve(), *dep_dirs}, key=lambda p: len(p.parts)):
+        if not any(d == r or r in d.parents for r in roots):
+            roots.append(d)
+    return roots
+
+
+def build_inputs(workspace_root: Path) -> List[Path]:
+    # Config files cargo reads from outside the scanned trees: every
+    # .cargo/config above the workspace root, and $CARGO_HOME's.
+    dirs = [d / ".cargo" for d in workspace_root.resolve().parents]
+    cargo_home = os.environ.get("CARGO_HOME")
+    dirs.append(Path(cargo_home) if cargo_home else Path.home() / ".cargo")
+    return [d / name for d in dirs for name in ("config", "config.toml")]
+
+
+def newest_source_mtime(
+    roots: List[Path], skip_dirs: List[Path], skip_files: List[str], extra: List[Path]
+) -> int:
+    # Every file counts, not just *.rs: build scripts and include_str! read
+    # arbitrary files (e.g. gmodx/build.rs reads lua.h).
+    newest = max((mtime_ns(p) for p in extra), default=0)
+    skip_dir_s = {os.path.realpath(d) for d in skip_dirs}
+    skip_file_s = {os.path.realpath(f) for f in skip_files}
+    stack = [str(r) for r in roots]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if (
+                        entry.name in VCS_DIRS
+                        or entry.name == "target"
+                        or os.path.realpath(entry.path) in skip_dir_s
+                    ):
+                        continue
+                    stack.append(entry.path)
+                elif os.path.realpath(entry.path) not in skip_file_s:
+                    newest = max(newest, entry.stat().st_mtime_ns)
+    return newest
+
+
+def is_up_to_date(
+    pkg_dir: Path,
+    workspace_root: Path,
+    target_dir: Path,
+    built_abs: str,
+    dest: str,
+    stamp: Path,
+    stamp_text: str,
+) -> bool:
+    try:
+        built_st = os.stat(built_abs)
+        dest_st = os.stat(dest)
+        stamp_st = os.stat(stamp)
+        if stamp.read_text(encoding="utf-8") != stamp_text:
+            return False
+    except OSError:
+        return False
+    # dest must be the copy of this exact artifact (copies keep the mtime),
+    # otherwise e.g. a dev build would pass for a release one.
+    if (
+        dest_st.st_size != built_st.st_size
+        or dest_st.st_mtime_ns != built_st.st_mtime_ns
+    ):
+        return False
+    try:
+        roots = scan_roots(
+            workspace_root, path_dependency_dirs([pkg_dir, workspace_root])
+        )
+        # The out dir holds our own outputs; skip it unless it *is* part of
+        # a scanned tree (e.g. -o .), then skip just dest.
+        outdir = Path(os.path.dirname(dest))
+        skip_dirs = [target_dir]
+        if not any(outdir == r or outdir in r.parents for r in roots):
+            skip_dirs.append(outdir)
+        newest = newest_source_mtime(
+            roots, skip_dirs, [dest], build_inputs(workspace_root)
+        )
+    except (OSError, ValueError):
+        # Unreadable dirs or manifests, dangling symlinks: let cargo decide.
+        return False
+    # The stamp carries the start time of the last successful cargo run, so
+    # inputs cargo already saw (even if it didn't relink) count as built.
+    return newest <= stamp_st.st_mtime_ns
+
+
+def build_one(
+    args: argparse.Namespace,
+    arch: int,
+    os_: str,
+    pkg_dir: Path,
+    lib_name: str,
+    target_dir: Path,
+    cargo_bin: Optional[Path] = None,
+) -> Tuple[str, str]:
+    target = target_triple(os_, arch, windows_gnu=args.windows_gnu)
+    base_name = args.name or lib_name
+
+    env = os.environ.copy()
+    # cross builds run inside a container that can't see the host's sccache.
+    if (
+        not args.no_sccache
+        and not args.cross
+        and "RUSTC_WRAPPER" not in env
+        and have("sccache")
+    ):
+        env["RUSTC_WRAPPER"] = "sccache"
+
+    # An empty RUSTFLAGS still counts as "set" to cargo, so only export it
+    # when there is something to pass.
+    env.pop("RUSTFLAGS", None)
+    rustflags_desc = ""
+    if args.link_args.strip() or args.rustflags.strip():
+        import shlex
+
+        rustflags = []
+        for tok in split_flags(args.link_args):
+            rustflags.extend(["-C", f"link-arg={tok}"])
+        rustflags.extend(split_flags(args.rustflags))
+        # The encoded form keeps tokens that contain spaces intact.
+        env["CARGO_ENCODED_RUSTFLAGS"] = "\x1f".join(rustflags)
+        rustflags_desc = shlex.join(rustflags)
+
+    # With a lock file and a warm registry cache there is nothing to fetch;
+    # skip cargo's index probe unless asked not to.
+    auto_offline = (
+        not args.offline
+        and not args.online
+        and "CARGO_NET_OFFLINE" not in env
+        and find_lockfile(pkg_dir) is not None
+        and registry_cache_populated()
+    )
+    if args.offline or auto_offline:
+        env.setdefault("CARGO_NET_OFFLINE", "true")
+
+    env["CARGO_TARGET_DIR"] = str(target_dir)
+    profile = "debug" if args.dev else "release"
+
+    # Name what is really exported: RUSTFLAGS is always cleared, and any
+    # flags go through CARGO_ENCODED_RUSTFLAGS.
+    if "CARGO_ENCODED_RUSTFLAGS" in env:
+        encoded = rustflags_desc or env["CARGO_ENCODED_RUSTFLAGS"].replace("\x1f", " ")
+        rustflags_line = f"CARGO_ENCODED_RUSTFLAGS = {encoded}"
+    else:
+        rustflags_line = "none (RUSTFLAGS unset)"
+    lines = [
+        "=" * 50,
+        "GMod Rust Build",
+        "-" * 50,
+        f"Toolchain       : {args.toolchain}",
+        f"Host OS         : {os_}",
+        f"Arch            : {arch}-bit",
+        f"Target          : {target}",
+        f"Crate dir       : {pkg_dir}",
+        f"Inferred lib    : {lib_name}",
+        f"Final base      : {base_name}",
+        f"Out dir         : {args.outdir}",
+        f"Profile         : {profile}",
+        f"Rustflags       : {rustflags_line}",
+        f"RUSTC_WRAPPER   : {env.get('RUSTC_WRAPPER', '')}",
+    ]
+    if auto_offline:
+        lines.append("Network         : offline (Cargo.lock found; --online to fetch)")
+    lines += ["=" * 50, ""]
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+    if args.cross:
+        cargo_cmd = ["cross", "build", "--target", target]
+    else:
+        # Calling the toolchain's cargo directly skips the rustup proxy;
+        # RUSTUP_TOOLCHAIN keeps the rustc it spawns on the same toolchain.
+        env["RUSTUP_TOOLCHAIN"] = args.toolchain
+        cargo_cmd = [str(cargo_bin or "cargo"), "build", "--target", target]
+
+    if args.offline:
+        cargo_cmd.append("--offline")
+
+    if not args.dev:
+        cargo_cmd.append("--release")
+        # Assume SMT: logical/2 keeps LTO codegen and the linker off sibling
+        # hyperthreads. Set through the env so a user's CARGO_BUILD_JOBS is
+        # kept; note it still overrides build.jobs from .cargo/config.
+        env.setdefault("CARGO_BUILD_JOBS", str((os.cpu_count() or 1) // 2 or 1))
+
+    built_abs = artifact_path_for(
+        target_dir, target, lib_name, os_, profile, windows_gnu=args.windows_gnu
+    )
+    dest = final_out_name(
+        os.path.realpath(args.outdir),
+        base_name,
+        os_,
+        arch,
+        windows_gnu=args.windows_gnu,
+    )
+    stamp = target_dir / ".build_py_cache" / f"{target}-{profile}.stamp"
+    stamp_text = build_stamp(args.toolchain, cargo_cmd, env)
+
+    if not args.force and is_up_to_date(
+        pkg_dir,
+        find_workspace_root(pkg_dir),
+        target_dir,
+        built_abs,
+        dest,
+        stamp,
+        stamp_text,
+    ):
+        print(f"Up to date: {dest}")
+        return built_abs, dest
+
+    ensure_dir(Path(args.outdir))
+    ensure_dir(target_dir)
+
+    started_ns = time.time_ns()
+    run(cargo_cmd, env=env, cwd=str(pkg_dir))
+
+    built_st = _stat(built_abs)
+    if built_st is None or not stat.S_ISREG(built_st.st_mode):
+        raise RuntimeError(f"built artifact not found: {built_abs}")
+
+    copy_artifact(built_abs, dest, built_st)
+    try:
+        ensure_dir(stamp.parent)
+        stamp.write_text(stamp_text, encoding="utf-8")
+        os.utime(stamp, ns=(started_ns, started_ns))
+    except OSError:
+        pass
+    return built_abs, dest
 
 
 def main():
@@ -172,10 +772,9 @@ def main():
     parser.add_argument(
         "-a",
         "--arch",
-        type=int,
-        choices=[32, 64],
-        default=32,
-        help="Target arch: 32 or 64 (default 32)",
+        choices=["32", "64", "all"],
+        default="32",
+        help="Target arch: 32, 64 or all to build both in parallel (default 32)",
     )
     parser.add_argument(
         "-o", "--outdir", default="bin", help="Output directory (default: bin)"
@@ -187,15 +786,19 @@ def main():
         help="Optional override for final base name (defaults to [lib].name)",
     )
     parser.add_argument(
-        "--rustflags", default="", help="Extra RUSTFLAGS to append (space separated)"
+        "--rustflags", default="", help="Extra RUSTFLAGS to append (shell-style quoting)"
     )
     parser.add_argument(
         "--link-args",
         default="",
-        help="Extra linker args; appended as -C link-arg=<arg> each",
+        help="Extra linker args (shell-style quoting); appended as -C link-arg=<arg> each",
     )
     parser.add_argument(
-        "-d", "--dev", action="store_true", help="Build in dev (non-release) mode"
+        "-d",
+        "--dev",
+        action="store_true",
+        help="Build in dev (non-release) mode. Release builds default "
+        "CARGO_BUILD_JOBS to half the logical CPUs, overriding build.jobs",
     )
     parser.add_argument(
         "-t",
@@ -209,85 +812,80 @@ def main():
     parser.add_argument(
         "--cross", action="store_true", help="Use cross-rs for cross-compilation"
     )
+    network = parser.add_mutually_exclusive_group()
+    network.add_argument(
+        "--offline", action="store_true", help="Pass --offline to cargo"
+    )
+    network.add_argument(
+        "--online",
+        action="store_true",
+        help="Allow network access even when Cargo.lock exists (needed after adding deps)",
+    )
+    parser.add_argument(
+        "--no-sccache",
+        action="store_true",
+        help="Don't set RUSTC_WRAPPER=sccache even if sccache is in PATH",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Always run cargo, even if no tracked input changed since the last build",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Echo every command before running it"
+    )
 
     args = parser.parse_args()
 
+    global VERBOSE
+    VERBOSE = args.verbose
+
     workdir = Path(args.directory).resolve()
-    if not workdir.is_dir():
+    st = _stat(workdir)
+    if st is None or not stat.S_ISDIR(st.st_mode):
         print(f"error: directory not found: {workdir}")
         sys.exit(1)
 
     os_ = host_os()
-    target = target_triple(os_, args.arch, windows_gnu=args.windows_gnu)
+    archs = [32, 64] if args.arch == "all" else [int(args.arch)]
 
     pkg_dir, lib_name = infer_pkg_and_lib(workdir)
-    base_name = args.name or lib_name
 
+    cargo_bin = None
     if not args.cross:
-        ensure_rust_toolchain_and_target(args.toolchain, target)
-
-    env = os.environ.copy()
-
-    rustflags = []
-    if args.link_args.strip():
-        for tok in args.link_args.strip().split():
-            rustflags.extend(["-C", f"link-arg={tok}"])
-    if args.rustflags.strip():
-        rustflags.extend(args.rustflags.strip().split())
-    env["RUSTFLAGS"] = " ".join(rustflags)
+        for arch in archs:
+            ensure_rust_toolchain_and_target(
+                args.toolchain, target_triple(os_, arch, windows_gnu=args.windows_gnu)
+            )
+        cargo_bin = resolve_cargo_bin(args.toolchain)
 
-    target_dir = Path(env.get("CARGO_TARGET_DIR")
+    target_dir = Path(os.environ.get("CARGO_TARGET_DIR")
                       or (pkg_dir / "target")).resolve()
-    env["CARGO_TARGET_DIR"] = str(target_dir)
-    profile = "debug" if args.dev else "release"
-
-    print("=" * 50)
-    print("GMod Rust Build")
-    print("-" * 50)
-    print(f"Toolchain       : {args.toolchain}")
-    print(f"Host OS         : {os_}")
-    print(f"Arch            : {args.arch}-bit")
-    print(f"Target          : {target}")
-    print(f"Crate dir       : {pkg_dir}")
-    print(f"Inferred lib    : {lib_name}")
-    print(f"Final base      : {base_name}")
-    print(f"Out dir         : {args.outdir}")
-    print(f"Profile         : {profile}")
-    print(f"RUSTFLAGS       : {env['RUSTFLAGS']}")
-    print("=" * 50)
-    print()
-
-    ensure_dir(Path(args.outdir))
-    ensure_dir(target_dir)
-
-    builder = "cross" if args.cross else "cargo"
 
-    if args.cross:
-        cargo_cmd = [builder, "build", "--target", target]
-    else:
-        cargo_cmd = [builder, f"+{args.toolchain}",
-                     "build", "--target", target]
-
-    if not args.dev:
-        cargo_cmd.append("--release")
-
-    run(cargo_cmd, env=env, cwd=str(pkg_dir))
-
-    built_abs = artifact_path_for(
-        target_dir, target, lib_name, os_, profile, windows_gnu=args.windows_gnu
-    )
-    if not built_abs.is_file():
-        print(f"error: built artifact not found: {built_abs}")
-        sys.exit(1)
-
-    dest = final_out_name(
-        Path(args.outdir).resolve(),
-        base_name,
-        os_,
-        args.arch,
-        windows_gnu=args.windows_gnu,
-    )
-    shutil.copy2(built_abs, dest)
+    if len(archs) == 1:
+        build_one(args, archs[0], os_, pkg_dir, lib_name, target_dir, cargo_bin)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Concurrent cargo runs would block on each other's lock of the shared
+    # host build dir, so every arch gets its own target dir.
+    with ThreadPoolExecutor(max_workers=len(archs)) as ex:
+        list(
+            ex.map(
+                lambda arch: build_one(
+                    args,
+                    arch,
+                    os_,
+                    pkg_dir,
+                    lib_name,
+                    target_dir / f"gmod{arch}",
+                    cargo_bin,
+                ),
+                archs,
+            )
+        )
 
 
 if __name__ == "__main__":
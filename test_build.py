@@ -0,0 +1,146 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import build
+
+
+class SplitFlagsTest(unittest.TestCase):
+    def test_keeps_windows_paths(self):
+        self.assertEqual(
+            build.split_flags(r"/LIBPATH:C:\libs\lua /DEBUG"),
+            [r"/LIBPATH:C:\libs\lua", "/DEBUG"],
+        )
+
+    def test_quoted_token_with_spaces(self):
+        self.assertEqual(
+            build.split_flags(
+                r"""-Wl,--as-needed '-Wl,-rpath,/a b' "/LIBPATH:C:\Lua libs" """
+            ),
+            ["-Wl,--as-needed", "-Wl,-rpath,/a b", r"/LIBPATH:C:\Lua libs"],
+        )
+
+    def test_empty(self):
+        self.assertEqual(build.split_flags("  "), [])
+
+
+class IsUpToDateTest(unittest.TestCase):
+    # ws/mod is a cdylib member with a path dependency on dep/, which lives
+    # outside the workspace root.
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name).resolve()
+        env = mock.patch.dict(os.environ, {"CARGO_HOME": str(self.root / "cargo")})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.ws = self.root / "ws"
+        self.pkg = self.ws / "mod"
+        self.dep = self.root / "dep"
+        self.write(self.ws / "Cargo.toml", '[workspace]\nmembers = ["mod"]\n')
+        self.write(
+            self.pkg / "Cargo.toml",
+            '[package]\nname = "mod"\n\n[lib]\ncrate-type = ["cdylib"]\n\n'
+            '[dependencies]\ndep = { path = "../../dep" }\n',
+        )
+        self.write(self.pkg / "src" / "lib.rs", "")
+        self.write(self.dep / "Cargo.toml", '[package]\nname = "dep"\n')
+        self.write(self.dep / "src" / "lib.rs", "")
+
+        self.target_dir = self.pkg / "target"
+        self.built = str(self.target_dir / "x" / "release" / "libmod.so")
+        self.dest = str(self.root / "bin" / "mod_linux64.dll")
+        self.stamp = self.target_dir / ".build_py_cache" / "x-release.stamp"
+        self.write(Path(self.built), "so")
+        self.write(Path(self.dest), "so")
+        self.write(self.stamp, "release")
+
+        now = time.time_ns()
+        self.sources_ns = now - 300 * 10**9
+        self.built_ns = now - 200 * 10**9
+        self.edit_ns = now
+        for d, _, files in os.walk(self.root):
+            for f in files:
+                os.utime(os.path.join(d, f), ns=(self.sources_ns, self.sources_ns))
+        for p in (self.built, self.dest):
+            os.utime(p, ns=(self.built_ns, self.built_ns))
+        stamp_ns = now - 100 * 10**9
+        os.utime(self.stamp, ns=(stamp_ns, stamp_ns))
+
+    def write(self, path: Path, text: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+    def touch(self, path: Path):
+        os.utime(path, ns=(self.edit_ns, self.edit_ns))
+
+    def up_to_date(self, stamp_text: str = "release") -> bool:
+        return build.is_up_to_date(
+            self.pkg,
+            self.ws,
+            self.target_dir,
+            self.built,
+            self.dest,
+            self.stamp,
+            stamp_text,
+        )
+
+    def test_unchanged(self):
+        self.assertTrue(self.up_to_date())
+
+    def test_member_source_edit(self):
+        self.touch(self.pkg / "src" / "lib.rs")
+        self.assertFalse(self.up_to_date())
+
+    def test_path_dependency_edit(self):
+        self.touch(self.dep / "src" / "lib.rs")
+        self.assertFalse(self.up_to_date())
+
+    def test_workspace_manifest_edit(self):
+        self.touch(self.ws / "Cargo.toml")
+        self.assertFalse(self.up_to_date())
+
+    def test_non_rust_build_input_edit(self):
+        self.write(self.pkg / "lua.h", "")
+        self.assertFalse(self.up_to_date())
+
+    def test_cargo_config_edit(self):
+        self.write(self.pkg / ".cargo" / "config.toml", "")
+        self.assertFalse(self.up_to_date())
+
+    def test_dev_release_stamp_mismatch(self):
+        self.assertFalse(self.up_to_date(stamp_text="debug"))
+
+    def test_dest_mtime_mismatch(self):
+        os.utime(self.dest, ns=(self.edit_ns, self.edit_ns))
+        self.assertFalse(self.up_to_date())
+
+    def test_unreadable_path_dependency(self):
+        (self.dep / "Cargo.toml").unlink()
+        self.assertFalse(self.up_to_date())
+
+
+class BuildStampTest(unittest.TestCase):
+    def test_tracks_cargo_relevant_env(self):
+        base = build.build_stamp("stable", ["cargo", "build"], {})
+        for key in (
+            "CARGO_PROFILE_RELEASE_LTO",
+            "CARGO_ENCODED_RUSTFLAGS",
+            "RUSTC_WRAPPER",
+        ):
+            self.assertNotEqual(
+                build.build_stamp("stable", ["cargo", "build"], {key: "x"}), base
+            )
+
+    def test_ignores_unrelated_env(self):
+        base = build.build_stamp("stable", ["cargo", "build"], {})
+        env = {"HOME": "/x", "CARGO_BUILD_JOBS": "4", "CARGO_NET_OFFLINE": "true"}
+        self.assertEqual(build.build_stamp("stable", ["cargo", "build"], env), base)
+
+
+if __name__ == "__main__":
+    unittest.main()